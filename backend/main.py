@@ -5,17 +5,20 @@ A FastAPI application that generates QR codes and stores them in multi-cloud sto
 Includes health checks, metrics, and comprehensive error handling.
 """
 
-import io
+import asyncio
+import base64
+import codecs
 import logging
 import os
 import time
-from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
 from typing import Dict, List, Optional
 
 import structlog
 from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from prometheus_fastapi_instrumentator import Instrumentator
 from pydantic import BaseModel, Field
@@ -45,11 +48,47 @@ structlog.configure(
 
 logger = structlog.get_logger()
 
+@contextmanager
+def _timed(event: str, **log_ctx):
+    """
+    Log an event with its duration measured on the monotonic clock
+
+    Yields a mutable context dict so callers can add fields (e.g. the
+    generated qr_id) that are only known once the timed block completes.
+    """
+    start = time.perf_counter_ns()
+    ctx = dict(log_ctx)
+    yield ctx
+    logger.info(event, duration_us=(time.perf_counter_ns() - start) // 1000, **ctx)
+
 # Prometheus metrics
 qr_generation_counter = Counter('qr_codes_generated_total', 'Total QR codes generated')
 qr_generation_duration = Histogram('qr_generation_duration_seconds', 'QR code generation duration')
-storage_upload_counter = Counter('storage_uploads_total', 'Total storage uploads', ['provider'])
-storage_upload_duration = Histogram('storage_upload_duration_seconds', 'Storage upload duration', ['provider'])
+# Allow-listed label schema for storage metrics. Both dimensions are
+# bounded (two providers, two outcomes); never add unbounded values like
+# qr_id or filename as labels -- each unique combination becomes a
+# separate time series in Prometheus
+_STORAGE_LABELS = ("provider", "outcome")
+
+storage_upload_counter = Counter('storage_uploads_total', 'Total storage uploads', _STORAGE_LABELS)
+storage_upload_duration = Histogram('storage_upload_duration_seconds', 'Storage upload duration', _STORAGE_LABELS)
+
+# Pre-resolved label children: labels() does a dict lookup and wrapper
+# construction per call, so bind every (provider, outcome) child once at import
+_STORAGE_METRICS = {
+    (provider, outcome): (
+        storage_upload_counter.labels(provider=provider, outcome=outcome),
+        storage_upload_duration.labels(provider=provider, outcome=outcome),
+    )
+    for provider in ("aws", "azure")
+    for outcome in ("success", "error")
+}
+
+def _record_upload(provider: str, success: bool, duration: float):
+    """Record counter and duration for a storage upload attempt"""
+    counter, histogram = _STORAGE_METRICS[(provider, "success" if success else "error")]
+    counter.inc()
+    histogram.observe(duration)
 
 # Pydantic models
 class QRCodeRequest(BaseModel):
@@ -69,7 +108,9 @@ class QRCodeResponse(BaseModel):
     format: str
     size: int
     download_url: str
-    qr_code_base64: str  # Base64 encoded QR code image for immediate preview
+    # Base64 preview is opt-in (?inline=true): embedding the encoded image
+    # inflates every response by ~1.33x the raw file size
+    qr_code_base64: Optional[str] = None
     aws_url: Optional[str] = None
     azure_url: Optional[str] = None
     created_at: str
@@ -90,13 +131,23 @@ class HealthResponse(BaseModel):
 # Global instances
 qr_generator = QRCodeGenerator()
 storage_manager = MultiCloudStorageManager()
-health_checker = HealthChecker()
+health_checker = HealthChecker(qr_generator, storage_manager)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     logger.info("Starting QR Code Generator API")
-    
+
+    # Size the loop's default executor so every run_in_executor(None, ...)
+    # call (storage SDK wrappers, psutil offloads) shares one bounded pool
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(
+        ThreadPoolExecutor(
+            max_workers=min(32, (os.cpu_count() or 1) * 4),
+            thread_name_prefix="qr"
+        )
+    )
+
     # Initialize services
     await storage_manager.initialize()
     await health_checker.initialize()
@@ -114,7 +165,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -126,61 +178,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Prometheus instrumentator
+# Initialize Prometheus instrumentator. Only instrument here: expose()
+# would register its own /metrics route ahead of the cached handler
+# below and shadow it
 instrumentator = Instrumentator()
-instrumentator.instrument(app).expose(app)
+instrumentator.instrument(app)
+
+# Constant response bodies, bound once so high-QPS probe endpoints
+# don't allocate a fresh dict per request
+_ROOT_BODY = {
+    "message": "Multi-Cloud QR Code Generator API",
+    "version": "1.0.0",
+    "docs": "/docs",
+    "health": "/health"
+}
+_LIVE_BODY = {"status": "alive"}
 
 @app.get("/", response_model=Dict[str, str])
 async def root():
     """Root endpoint"""
-    return {
-        "message": "Multi-Cloud QR Code Generator API",
-        "version": "1.0.0",
-        "docs": "/docs",
-        "health": "/health"
-    }
+    return _ROOT_BODY
 
 @app.post("/qr/generate", response_model=QRCodeResponse)
-async def generate_qr_code(request: QRCodeRequest, background_tasks: BackgroundTasks):
+async def generate_qr_code(request: QRCodeRequest, background_tasks: BackgroundTasks, inline: bool = False):
     """Generate a single QR code"""
-    start_time = time.time()
-    
     try:
         logger.info("Generating QR code", data_length=len(request.data), format=request.format)
-        
-        # Generate QR code
-        with qr_generation_duration.time():
-            qr_result = await qr_generator.generate_qr_code(
-                data=request.data,
-                format=request.format,
-                size=request.size,
-                border=request.border,
-                error_correction=request.error_correction,
-                fill_color=request.fill_color,
-                back_color=request.back_color
+
+        with _timed("QR code generated successfully") as timing:
+            # Generate QR code
+            with qr_generation_duration.time():
+                qr_result = await qr_generator.generate_qr_code(
+                    data=request.data,
+                    format=request.format,
+                    size=request.size,
+                    border=request.border,
+                    error_correction=request.error_correction,
+                    fill_color=request.fill_color,
+                    back_color=request.back_color
+                )
+
+            qr_generation_counter.inc()
+
+            # Upload to multi-cloud storage in background
+            background_tasks.add_task(
+                upload_to_storage,
+                qr_result["id"],
+                qr_result["file_data"],
+                request.format.lower()
             )
-        
-        qr_generation_counter.inc()
-        
-        # Upload to multi-cloud storage in background
-        background_tasks.add_task(
-            upload_to_storage,
-            qr_result["id"],
-            qr_result["file_data"],
-            request.format.lower()
-        )
-        
-        logger.info("QR code generated successfully", 
-                   qr_id=qr_result["id"], 
-                   duration=time.time() - start_time)
-        
+
+            timing["qr_id"] = qr_result["id"]
+
         return QRCodeResponse(
             id=qr_result["id"],
             data=request.data,
             format=request.format,
             size=request.size,
             download_url=f"/qr/download/{qr_result['id']}",
-            qr_code_base64=qr_result["base64_data"],
+            qr_code_base64=base64.b64encode(memoryview(qr_result["file_data"])).decode('ascii') if inline else None,
             created_at=qr_result["created_at"]
         )
         
@@ -194,60 +250,82 @@ async def generate_batch_qr_codes(request: BatchQRRequest, background_tasks: Bac
     if len(request.items) > 100:
         raise HTTPException(status_code=400, detail="Batch size cannot exceed 100 items")
     
-    start_time = time.time()
     results = []
-    
+
     try:
         logger.info("Generating batch QR codes", count=len(request.items))
-        
-        for item in request.items:
-            qr_result = await qr_generator.generate_qr_code(
-                data=item,
-                format=request.format,
-                size=request.size
-            )
-            
-            results.append(QRCodeResponse(
-                id=qr_result["id"],
-                data=item,
-                format=request.format,
-                size=request.size,
-                download_url=f"/qr/download/{qr_result['id']}",
-                created_at=qr_result["created_at"]
-            ))
-            
-            # Upload to storage in background
-            background_tasks.add_task(
-                upload_to_storage,
-                qr_result["id"],
-                qr_result["file_data"],
-                request.format.lower()
+
+        with _timed("Batch QR codes generated successfully") as timing:
+            # Generate all items concurrently; the semaphore caps the number of
+            # in-flight generations so large batches don't starve the thread pool
+            semaphore = asyncio.Semaphore(32)
+
+            async def generate_item(item: str):
+                async with semaphore:
+                    return await qr_generator.generate_qr_code(
+                        data=item,
+                        format=request.format,
+                        size=request.size
+                    )
+
+            qr_results = await asyncio.gather(
+                *[generate_item(item) for item in request.items],
+                return_exceptions=True
             )
-            
-            qr_generation_counter.inc()
-        
-        logger.info("Batch QR codes generated successfully", 
-                   count=len(results), 
-                   duration=time.time() - start_time)
-        
+
+            for item, qr_result in zip(request.items, qr_results):
+                if isinstance(qr_result, BaseException):
+                    raise qr_result
+
+                results.append(QRCodeResponse(
+                    id=qr_result["id"],
+                    data=item,
+                    format=request.format,
+                    size=request.size,
+                    download_url=f"/qr/download/{qr_result['id']}",
+                    created_at=qr_result["created_at"]
+                ))
+
+                # Upload to storage in background
+                background_tasks.add_task(
+                    upload_to_storage,
+                    qr_result["id"],
+                    qr_result["file_data"],
+                    request.format.lower()
+                )
+
+                qr_generation_counter.inc()
+
+            timing["count"] = len(results)
+
         return results
-        
+
     except Exception as e:
         logger.error("Failed to generate batch QR codes", error=str(e))
         raise HTTPException(status_code=500, detail=f"Batch QR code generation failed: {str(e)}")
 
+# File extensions for download filenames, keyed by content type
+_FILE_EXTENSIONS = {
+    "image/png": "png",
+    "image/svg+xml": "svg",
+    "application/pdf": "pdf"
+}
+
 @app.get("/qr/download/{qr_id}")
 async def download_qr_code(qr_id: str):
     """Download a generated QR code"""
     try:
         file_data, content_type = await qr_generator.get_qr_code(qr_id)
-        
-        return StreamingResponse(
-            io.BytesIO(file_data),
+        extension = _FILE_EXTENSIONS.get(content_type, "png")
+
+        # file_data is already a small bytes object, so return it directly
+        # rather than iterating a BytesIO through StreamingResponse
+        return Response(
+            content=file_data,
             media_type=content_type,
-            headers={"Content-Disposition": f"attachment; filename={qr_id}.png"}
+            headers={"Content-Disposition": f'attachment; filename="{qr_id}.{extension}"'}
         )
-        
+
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="QR code not found")
     except Exception as e:
@@ -255,44 +333,95 @@ async def download_qr_code(qr_id: str):
         raise HTTPException(status_code=500, detail="Download failed")
 
 @app.post("/qr/upload")
-async def upload_file_for_qr_generation(file: UploadFile = File(...)):
+async def upload_file_for_qr_generation(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload a file and generate QR codes for each line"""
     if not file.filename.endswith(('.txt', '.csv')):
         raise HTTPException(status_code=400, detail="Only .txt and .csv files are supported")
-    
+
     try:
-        content = await file.read()
-        lines = content.decode('utf-8').strip().split('\n')
-        
-        if len(lines) > 100:
-            raise HTTPException(status_code=400, detail="File cannot contain more than 100 lines")
-        
-        # Process as batch
-        batch_request = BatchQRRequest(items=[line.strip() for line in lines if line.strip()])
-        return await generate_batch_qr_codes(batch_request, BackgroundTasks())
-        
+        # Stream the upload line by line instead of materializing the
+        # whole decoded file, short-circuiting once the cap is exceeded
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        items = []
+        buffer = ""
+
+        while chunk := await file.read(64 * 1024):
+            buffer += decoder.decode(chunk)
+            # Normalize \r\n and bare \r endings so CSV exports from any
+            # platform split correctly (empty lines are dropped below)
+            buffer = buffer.replace('\r\n', '\n').replace('\r', '\n')
+            *complete_lines, buffer = buffer.split('\n')
+            for line in complete_lines:
+                line = line.strip()
+                if line:
+                    items.append(line)
+                    if len(items) > 100:
+                        raise HTTPException(status_code=400, detail="File cannot contain more than 100 lines")
+
+        last_line = (buffer + decoder.decode(b'', final=True)).strip()
+        if last_line:
+            items.append(last_line)
+            if len(items) > 100:
+                raise HTTPException(status_code=400, detail="File cannot contain more than 100 lines")
+
+        # Process as batch, passing the request's BackgroundTasks through
+        # so the queued cloud uploads actually run after the response
+        batch_request = BatchQRRequest(items=items)
+        return await generate_batch_qr_codes(batch_request, background_tasks)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("Failed to process uploaded file", filename=file.filename, error=str(e))
         raise HTTPException(status_code=500, detail="File processing failed")
 
+async def _upload_aws(qr_id: str, file_data: bytes, file_format: str) -> Optional[str]:
+    """Upload a QR code to AWS S3 with per-provider metrics"""
+    # Unconfigured providers are a deployment choice, not a failure:
+    # recording them would count an error and a no-op timing per QR
+    if not storage_manager.aws_enabled:
+        return None
+
+    start = time.perf_counter()
+    url = None
+    try:
+        url = await storage_manager.upload_to_aws(qr_id, file_data, file_format)
+    finally:
+        _record_upload("aws", url is not None, time.perf_counter() - start)
+    return url
+
+async def _upload_azure(qr_id: str, file_data: bytes, file_format: str) -> Optional[str]:
+    """Upload a QR code to Azure Blob Storage with per-provider metrics"""
+    if not storage_manager.azure_enabled:
+        return None
+
+    start = time.perf_counter()
+    url = None
+    try:
+        url = await storage_manager.upload_to_azure(qr_id, file_data, file_format)
+    finally:
+        _record_upload("azure", url is not None, time.perf_counter() - start)
+    return url
+
 async def upload_to_storage(qr_id: str, file_data: bytes, file_format: str):
     """Background task to upload QR code to multi-cloud storage"""
-    try:
-        # Upload to AWS S3
-        with storage_upload_duration.labels(provider="aws").time():
-            aws_url = await storage_manager.upload_to_aws(qr_id, file_data, file_format)
-            storage_upload_counter.labels(provider="aws").inc()
-        
-        # Upload to Azure Blob Storage
-        with storage_upload_duration.labels(provider="azure").time():
-            azure_url = await storage_manager.upload_to_azure(qr_id, file_data, file_format)
-            storage_upload_counter.labels(provider="azure").inc()
-        
-        logger.info("QR code uploaded to multi-cloud storage", 
-                   qr_id=qr_id, aws_url=aws_url, azure_url=azure_url)
-        
-    except Exception as e:
-        logger.error("Failed to upload to storage", qr_id=qr_id, error=str(e))
+    # Upload to both providers concurrently so a slow provider
+    # doesn't serialize the other
+    aws_result, azure_result = await asyncio.gather(
+        _upload_aws(qr_id, file_data, file_format),
+        _upload_azure(qr_id, file_data, file_format),
+        return_exceptions=True
+    )
+
+    if isinstance(aws_result, BaseException):
+        logger.error("Failed to upload to AWS S3", qr_id=qr_id, error=str(aws_result))
+        aws_result = None
+    if isinstance(azure_result, BaseException):
+        logger.error("Failed to upload to Azure Blob Storage", qr_id=qr_id, error=str(azure_result))
+        azure_result = None
+
+    logger.info("QR code uploaded to multi-cloud storage",
+               qr_id=qr_id, aws_url=aws_result, azure_url=azure_result)
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
@@ -319,19 +448,55 @@ async def readiness_check():
 @app.get("/health/live")
 async def liveness_check():
     """Kubernetes liveness probe"""
-    return {"status": "alive", "timestamp": time.time()}
+    # Kubernetes only checks the status code, so skip the timestamp
+    return _LIVE_BODY
+
+# Cached /metrics payload: generate_latest() walks every collector, so
+# serialize off the event loop and reuse the result for up to a second,
+# coalescing concurrent scrapes behind the lock
+_metrics_cache = (0.0, b"")
+_metrics_lock = asyncio.Lock()
 
 @app.get("/metrics")
 async def get_metrics():
     """Prometheus metrics endpoint"""
-    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    global _metrics_cache
+
+    ts, body = _metrics_cache
+    if time.monotonic() - ts < 1.0:
+        return Response(body, media_type=CONTENT_TYPE_LATEST)
+
+    async with _metrics_lock:
+        ts, body = _metrics_cache
+        now = time.monotonic()
+        if now - ts < 1.0:
+            return Response(body, media_type=CONTENT_TYPE_LATEST)
+
+        body = await asyncio.to_thread(generate_latest)
+        _metrics_cache = (now, body)
+
+    return Response(body, media_type=CONTENT_TYPE_LATEST)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_config=None  # Use structlog configuration
-    )
+
+    if os.getenv("ENV") == "dev":
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=int(os.getenv("PORT", 8000)),
+            reload=True,
+            log_config=None  # Use structlog configuration
+        )
+    else:
+        # Production: uvloop + httptools event loop and one worker per
+        # core (WEB_CONCURRENCY overrides), no auto-reload
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=int(os.getenv("PORT", 8000)),
+            workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+            loop="uvloop",
+            http="httptools",
+            log_config=None  # Use structlog configuration
+        )
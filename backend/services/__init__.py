@@ -5,6 +5,10 @@ This package contains all the business logic services:
 - QR Code generation
 - Multi-cloud storage management
 - Health checking and monitoring
+
+Metrics convention: Prometheus labels must stay bounded. Never label a
+metric with unbounded identifiers (qr_id, filename, tenant) -- every
+distinct label value creates a new time series and degrades scraping.
 """
 
 from .qr_generator import QRCodeGenerator
@@ -0,0 +1,22 @@
+"""
+Shared timestamp helper for the services package.
+
+Metadata timestamps only need one-second resolution, so the ISO string
+is formatted at most once per second and reused in between instead of
+allocating a fresh datetime + isoformat on every request.
+"""
+
+import time
+from datetime import datetime, timezone
+
+_last_ts = -1
+_last_str = ""
+
+def now_iso() -> str:
+    """Current UTC time as an ISO-8601 string, cached per second"""
+    global _last_ts, _last_str
+    t = int(time.time())
+    if t != _last_ts:
+        _last_str = datetime.fromtimestamp(t, tz=timezone.utc).isoformat()
+        _last_ts = t
+    return _last_str
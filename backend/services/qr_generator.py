@@ -5,35 +5,447 @@ Handles QR code generation with various formats and customization options.
 Supports PNG, SVG, and PDF output formats with caching capabilities.
 """
 
+import atexit
+import copy
+import hashlib
 import io
-import uuid
-from datetime import datetime
+import os
+import random
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+import types
+from collections import OrderedDict
 from typing import Dict, Tuple, Optional
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from ._timestamps import now_iso
+
+try:
+    # SIMD-accelerated DEFLATE when available
+    from zlib_ng import zlib_ng as zlib
+except ImportError:
+    import zlib
+
+try:
+    # Vectorized matrix rasterization when available
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    # Vector PDF output when available
+    from reportlab.pdfgen import canvas as _pdf_canvas
+except ImportError:
+    _pdf_canvas = None
+
+try:
+    # Transparent compression of cold cache entries when available
+    import zstandard
+    _ZSTD_COMPRESSOR = zstandard.ZstdCompressor(level=3)
+    _ZSTD_DECOMPRESSOR = zstandard.ZstdDecompressor()
+except ImportError:
+    _ZSTD_COMPRESSOR = None
+    _ZSTD_DECOMPRESSOR = None
+
 import qrcode
+
+try:
+    # libqrencode bindings: moves Reed-Solomon and mask evaluation from
+    # Python bytecode into C when installed
+    import qrencode
+    _QRENCODE_LEVELS = {
+        'L': qrencode.QR_ECLEVEL_L,
+        'M': qrencode.QR_ECLEVEL_M,
+        'Q': qrencode.QR_ECLEVEL_Q,
+        'H': qrencode.QR_ECLEVEL_H,
+    }
+except ImportError:
+    qrencode = None
+    _QRENCODE_LEVELS = {}
+
 from qrcode.image.styledpil import StyledPilImage
 from qrcode.image.styles.moduledrawers import RoundedModuleDrawer, CircleModuleDrawer
-from PIL import Image, ImageDraw
+from PIL import Image, ImageColor, ImageDraw
+from prometheus_client import Gauge
 import structlog
 
-logger = structlog.get_logger()
+# Bind the component context once instead of per log call
+logger = structlog.get_logger().bind(component="qr_generator")
+
+# Fraction of per-item generation logs actually emitted (1.0 = all);
+# lower under bursty load where log rendering becomes measurable
+_LOG_SAMPLE_RATE = float(os.getenv("QR_LOG_SAMPLE_RATE", "1.0"))
+
+def _log_sampled(log_method, event: str, **kwargs):
+    """Emit a hot-path log for roughly _LOG_SAMPLE_RATE of calls"""
+    if _LOG_SAMPLE_RATE >= 1.0 or random.random() < _LOG_SAMPLE_RATE:
+        log_method(event, **kwargs)
+
+qr_cache_items = Gauge('qr_cache_items', 'Number of QR codes held in the in-memory cache')
+
+# Single process-wide generation pool: PIL and zlib release the GIL, so
+# size it to the core count (QR_WORKERS overrides) rather than spawning
+# a fixed four threads per QRCodeGenerator instance
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("QR_WORKERS", os.cpu_count() or 4)),
+    thread_name_prefix="qrgen"
+)
+atexit.register(_EXECUTOR.shutdown, wait=False)
+
+# Error correction levels mapping, frozen at module scope
+_ECC = types.MappingProxyType({
+    'L': qrcode.constants.ERROR_CORRECT_L,  # ~7%
+    'M': qrcode.constants.ERROR_CORRECT_M,  # ~15%
+    'Q': qrcode.constants.ERROR_CORRECT_Q,  # ~25%
+    'H': qrcode.constants.ERROR_CORRECT_H,  # ~30%
+})
+
+# Content types by output format, frozen at module scope
+_CONTENT_TYPES = types.MappingProxyType({
+    "PNG": "image/png",
+    "SVG": "image/svg+xml",
+    "PDF": "application/pdf"
+})
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _png_chunk(tag: bytes, payload: bytes) -> bytes:
+    """Build one PNG chunk: length, tag, payload, CRC"""
+    return (struct.pack('>I', len(payload)) + tag + payload
+            + struct.pack('>I', zlib.crc32(tag + payload)))
+
+def _pack_matrix(matrix) -> Tuple[list, int]:
+    """
+    Pack a bool module matrix into per-row bitmasks
+
+    Bit j of rows[i] encodes module (i, j). The nested list-of-bools from
+    get_matrix costs ~28 bytes per module and two pointer hops per read;
+    one int per row keeps traversal in tight arbitrary-precision bit ops
+    shared by every direct renderer.
+    """
+    rows = []
+    for row in matrix:
+        bits = 0
+        for j, cell in enumerate(row):
+            if cell:
+                bits |= 1 << j
+        rows.append(bits)
+    return rows, len(matrix)
+
+def _bit_runs(row_bits: int):
+    """Yield (start, length) for each run of set bits, column 0 first"""
+    x = 0
+    while row_bits:
+        zeros = (row_bits & -row_bits).bit_length() - 1
+        x += zeros
+        row_bits >>= zeros
+        ones = ((row_bits + 1) & ~row_bits).bit_length() - 1
+        yield x, ones
+        x += ones
+        row_bits >>= ones
+
+def _css_color(color: str) -> str:
+    """
+    Normalize a user-supplied color to #rrggbb
+
+    Colors arrive as free-form request strings and are embedded in SVG
+    and PDF markup, so they must be validated and canonicalized rather
+    than interpolated verbatim (raw values would allow markup injection
+    into stored, served documents). Raises ValueError on anything
+    ImageColor can't parse, which sends callers down the qrcode fallback.
+    """
+    r, g, b = ImageColor.getrgb(color)[:3]
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+def _write_png_1bit(rows, width: int, box_size: int, fill_color: str, back_color: str) -> bytes:
+    """
+    Encode packed QR module rows as a 1-bit palette PNG
+
+    QR codes are monochrome, so a hand-packed 1-bit-per-pixel indexed PNG
+    skips Pillow's palette conversion, filter search, and optimize passes
+    entirely: each module row is bit-packed into a scanline once and
+    repeated box_size times, then deflated in a single pass.
+    """
+    back_rgb = ImageColor.getrgb(back_color)[:3]
+    fill_rgb = ImageColor.getrgb(fill_color)[:3]
+
+    pixels = width * box_size
+
+    raw = bytearray()
+    for row_bits in rows:
+        bits = bytearray()
+        accumulator = 0
+        bit_count = 0
+        for j in range(width):
+            bit = (row_bits >> j) & 1
+            for _ in range(box_size):
+                accumulator = (accumulator << 1) | bit
+                bit_count += 1
+                if bit_count == 8:
+                    bits.append(accumulator)
+                    accumulator = 0
+                    bit_count = 0
+        if bit_count:
+            bits.append(accumulator << (8 - bit_count))
+
+        # Filter byte 0 (None) per scanline, repeated for the box height
+        raw += (b'\x00' + bytes(bits)) * box_size
+
+    header = struct.pack('>IIBBBBB', pixels, pixels, 1, 3, 0, 0, 0)
+    palette = bytes(back_rgb) + bytes(fill_rgb)
+
+    return (_PNG_SIGNATURE
+            + _png_chunk(b'IHDR', header)
+            + _png_chunk(b'PLTE', palette)
+            + _png_chunk(b'IDAT', zlib.compress(bytes(raw), 6))
+            + _png_chunk(b'IEND', b''))
+
+def _write_svg(rows, width: int, box_size: int, fill_color: str, back_color: str) -> bytes:
+    """
+    Emit packed QR module rows as a single-path SVG
+
+    Dark modules are coalesced into horizontal runs and drawn by one
+    <path>, so the output is built with plain string joins instead of an
+    ElementTree DOM and is smaller than the per-module path qrcode emits.
+    """
+    fill_color = _css_color(fill_color)
+    back_color = _css_color(back_color)
+    side = width * box_size
+
+    runs = []
+    for y, row_bits in enumerate(rows):
+        for start, length in _bit_runs(row_bits):
+            runs.append(f'M{start} {y}h{length}v1H{start}z')
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {width}" '
+        f'width="{side}" height="{side}" shape-rendering="crispEdges">'
+        f'<rect width="{width}" height="{width}" fill="{back_color}"/>'
+        f'<path fill="{fill_color}" d="{"".join(runs)}"/></svg>'
+    ).encode('utf-8')
+
+def _write_pdf_vector(rows, width: int, box_size: int, fill_color: str, back_color: str) -> bytes:
+    """
+    Draw packed QR module rows as a vector PDF
+
+    One filled rect per horizontal run of dark modules instead of an
+    embedded raster stream: faster to encode, much smaller, and scales
+    losslessly.
+    """
+    fill_color = _css_color(fill_color)
+    back_color = _css_color(back_color)
+    side = width * box_size
+
+    buf = io.BytesIO()
+    pdf = _pdf_canvas.Canvas(buf, pagesize=(side, side))
+    pdf.setFillColor(back_color)
+    pdf.rect(0, 0, side, side, fill=1, stroke=0)
+    pdf.setFillColor(fill_color)
+
+    for y, row_bits in enumerate(rows):
+        for start, length in _bit_runs(row_bits):
+            # PDF origin is bottom-left
+            pdf.rect(start * box_size, side - (y + 1) * box_size,
+                     length * box_size, box_size, fill=1, stroke=0)
+
+    pdf.showPage()
+    pdf.save()
+    return buf.getvalue()
+
+def _matrix_to_image(matrix, box_size: int) -> Image.Image:
+    """
+    Rasterize a module matrix to a 1-bit PIL image with NumPy
+
+    One kron upsample replaces Pillow's per-pixel matrix walk: the whole
+    raster is produced by contiguous array ops before a single fromarray.
+    """
+    arr = np.asarray(matrix, dtype=np.uint8)
+    arr = np.where(arr, np.uint8(0), np.uint8(255))
+    arr = np.kron(arr, np.ones((box_size, box_size), dtype=np.uint8))
+    return Image.fromarray(arr, mode='L').convert('1')
+
+class _LRUCache(OrderedDict):
+    """
+    Size-bounded LRU cache for QR code results
+
+    Evicts the least recently used entry once either the item count or the
+    running payload byte total exceeds its bound. The byte total is tracked
+    incrementally so stats stay O(1). Mutations take a lock because results
+    can be inserted from executor threads.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int):
+        super().__init__()
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            # Store a private copy: demotion rewrites file_data in place,
+            # which must never touch the dict callers were handed
+            value = dict(value)
+            if key in self:
+                self._bytes -= len(super().__getitem__(key)["file_data"])
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            self._bytes += len(value["file_data"])
+
+            while len(self) > self.max_items or self._bytes > self.max_bytes:
+                # Under byte pressure, try zstd-compressing the coldest
+                # entries before giving up and evicting them: a small
+                # decode cost on rare cold reads buys a better hit ratio
+                if (self._bytes > self.max_bytes
+                        and len(self) <= self.max_items
+                        and _ZSTD_COMPRESSOR is not None
+                        and self._demote_one()):
+                    continue
+                _, evicted = self.popitem(last=False)
+                self._bytes -= len(evicted["file_data"])
+
+    def _demote_one(self) -> bool:
+        """Compress the coldest uncompressed entry; False when none is left
+
+        PNG payloads are already deflated and rarely shrink, so entries
+        that don't compress by at least 10% are marked incompressible and
+        never retried.
+        """
+        for key in self:  # iterates coldest to hottest
+            entry = super().__getitem__(key)
+            if entry.get("compressed") or entry.get("incompressible"):
+                continue
+            blob = _ZSTD_COMPRESSOR.compress(entry["file_data"])
+            if len(blob) < len(entry["file_data"]) * 0.9:
+                self._bytes -= len(entry["file_data"]) - len(blob)
+                entry["file_data"] = blob
+                entry["compressed"] = True
+                return True
+            entry["incompressible"] = True
+        return False
+
+    def touch(self, key):
+        """Mark an entry as recently used"""
+        with self._lock:
+            if key in self:
+                self.move_to_end(key)
+
+    def stats(self) -> Tuple[int, int]:
+        """Return (item count, total payload bytes)"""
+        with self._lock:
+            return len(self), self._bytes
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._bytes = 0
+
+class _DiskCache:
+    """
+    SQLite-backed persistent tier behind the in-memory LRU
+
+    Survives process restarts so redeployments don't force regeneration
+    of every cached QR code. Entries carry a last-used timestamp and the
+    least recently used rows are deleted once the bound is exceeded,
+    mirroring the in-memory eviction policy.
+    """
+
+    def __init__(self, path: str, max_items: int):
+        self._max_items = max_items
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS qr_codes ("
+            "qr_id TEXT PRIMARY KEY, format TEXT, file_data BLOB, "
+            "created_at TEXT, last_used REAL)"
+        )
+        self._conn.commit()
+
+    def put(self, result: Dict):
+        """Persist a generated QR code, evicting LRU rows past the bound"""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO qr_codes VALUES (?, ?, ?, ?, ?)",
+                    (result["id"], result["format"], result["file_data"],
+                     result["created_at"], time.time())
+                )
+                self._conn.execute(
+                    "DELETE FROM qr_codes WHERE qr_id IN ("
+                    "SELECT qr_id FROM qr_codes ORDER BY last_used DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self._max_items,)
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Disk cache write failed", qr_id=result["id"], error=str(e))
+
+    def get(self, qr_id: str) -> Optional[Dict]:
+        """Load a QR code by id, refreshing its recency; None on miss"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT format, file_data, created_at FROM qr_codes WHERE qr_id = ?",
+                    (qr_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute(
+                    "UPDATE qr_codes SET last_used = ? WHERE qr_id = ?",
+                    (time.time(), qr_id)
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Disk cache read failed", qr_id=qr_id, error=str(e))
+            return None
+
+        return {
+            "id": qr_id,
+            "format": row[0],
+            "file_data": row[1],
+            "created_at": row[2],
+            "file_size": len(row[1])
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
 
 class QRCodeGenerator:
     """QR Code generation service with multi-format support"""
     
     def __init__(self):
-        self.cache = {}  # In-memory cache for generated QR codes
-        self.executor = ThreadPoolExecutor(max_workers=4)
-        
-        # Error correction levels mapping
-        self.error_correction_levels = {
-            'L': qrcode.constants.ERROR_CORRECT_L,  # ~7%
-            'M': qrcode.constants.ERROR_CORRECT_M,  # ~15%
-            'Q': qrcode.constants.ERROR_CORRECT_Q,  # ~25%
-            'H': qrcode.constants.ERROR_CORRECT_H,  # ~30%
-        }
+        # In-memory LRU cache for generated QR codes, bounded by item count
+        # and payload bytes so sustained traffic can't grow it without limit
+        self.cache = _LRUCache(
+            max_items=int(os.getenv("QR_CACHE_MAX_ITEMS", "1024")),
+            max_bytes=int(os.getenv("QR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        )
+        # Optional persistent tier: enabled by pointing QR_DISK_CACHE_PATH
+        # at a writable SQLite file (cross-restart hits skip regeneration)
+        disk_path = os.getenv("QR_DISK_CACHE_PATH")
+        self.disk_cache = _DiskCache(
+            disk_path,
+            max_items=int(os.getenv("QR_DISK_CACHE_MAX_ITEMS", "10000"))
+        ) if disk_path else None
+
+        self.executor = _EXECUTOR
+
+        # Content-addressed index: parameter-tuple hash -> qr_id of an
+        # identical previously generated code, so repeat requests skip
+        # the whole rasterization path. LRU-bounded to the cache's item
+        # count: entries pointing past the backing cache are useless
+        self._param_index: "OrderedDict[bytes, str]" = OrderedDict()
+        # Pre-built QRCode instances keyed by (ecc, box_size, border);
+        # requests take a shallow copy instead of re-running the
+        # constructor (only relevant when the qrencode fast path is not
+        # taken, since that path never builds a QRCode at all)
+        self._templates: Dict[Tuple[str, int, int], qrcode.QRCode] = {}
+        self._self_test_result = None
     
     async def generate_qr_code(
         self,
@@ -62,16 +474,61 @@ class QRCodeGenerator:
         Returns:
             Dictionary containing QR code data and metadata
         """
-        qr_id = str(uuid.uuid4())
-        
+        # 16 random bytes rendered as hex: same entropy as uuid4 without
+        # the UUID object construction and canonical formatting
+        qr_id = secrets.token_bytes(16).hex()
+
+        # Normalize once at the async boundary so the sync path and cache
+        # key never re-case the same strings
+        format = format.upper()
+        error_correction = error_correction.upper()
+
+        # Dedup: identical parameter tuples reuse the previously rendered
+        # bytes under a fresh id instead of re-encoding the QR matrix
+        param_key = hashlib.blake2b(
+            repr((data, format, size, border, error_correction,
+                  fill_color, back_color, style)).encode(),
+            digest_size=16
+        ).digest()
+
+        cached_id = self._param_index.get(param_key)
+        if cached_id is not None:
+            cached = self.cache.get(cached_id)
+            if cached is not None:
+                self._param_index.move_to_end(param_key)
+                # Inflate demoted entries: the fresh copy is hot again and
+                # callers expect raw bytes in file_data
+                file_data = cached["file_data"]
+                if cached.get("compressed"):
+                    file_data = _ZSTD_DECOMPRESSOR.decompress(file_data)
+
+                result = {
+                    **cached,
+                    "id": qr_id,
+                    "file_data": file_data,
+                    "created_at": now_iso()
+                }
+                result.pop("compressed", None)
+                result.pop("incompressible", None)
+                self.cache[qr_id] = result
+                qr_cache_items.set(len(self.cache))
+                logger.debug("QR code served from dedup cache",
+                            qr_id=qr_id, source_id=cached_id)
+                return result
+            # The indexed entry was evicted; drop the stale pointer
+            del self._param_index[param_key]
+
         try:
-            logger.info("Generating QR code", 
-                       qr_id=qr_id, 
-                       data_length=len(data), 
-                       format=format)
+            # Per-item logs are debug-level and sampled: the API layer
+            # already emits one aggregated log per request, and rendering
+            # two extra events per QR is measurable on large batches
+            _log_sampled(logger.debug, "Generating QR code",
+                        qr_id=qr_id,
+                        data_length=len(data),
+                        format=format)
             
             # Run QR generation in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             file_data = await loop.run_in_executor(
                 self.executor,
                 self._generate_qr_sync,
@@ -79,27 +536,37 @@ class QRCodeGenerator:
                 fill_color, back_color, style
             )
             
-            # Convert file data to base64 for immediate preview
-            import base64
-            base64_data = base64.b64encode(file_data).decode('utf-8')
-
+            # base64 previews are computed on demand by the API layer;
+            # storing them alongside the raw bytes would inflate every
+            # cache entry by ~1.33x
             result = {
                 "id": qr_id,
                 "data": data,
                 "format": format,
                 "size": size,
                 "file_data": file_data,
-                "base64_data": base64_data,
-                "created_at": datetime.utcnow().isoformat(),
+                "created_at": now_iso(),
                 "file_size": len(file_data)
             }
             
-            # Cache the result
+            # Cache the result; the LRU evicts once past its bounds
             self.cache[qr_id] = result
+            self._param_index[param_key] = qr_id
+            self._param_index.move_to_end(param_key)
+            while len(self._param_index) > self.cache.max_items:
+                self._param_index.popitem(last=False)
+            qr_cache_items.set(len(self.cache))
+
+            if self.disk_cache:
+                # SQLite write + commit fsyncs; keep it off the loop like
+                # the generation work itself
+                await loop.run_in_executor(
+                    self.executor, self.disk_cache.put, result
+                )
             
-            logger.info("QR code generated successfully", 
-                       qr_id=qr_id, 
-                       file_size=len(file_data))
+            _log_sampled(logger.debug, "QR code generated successfully",
+                        qr_id=qr_id,
+                        file_size=len(file_data))
             
             return result
             
@@ -109,6 +576,61 @@ class QRCodeGenerator:
                         error=str(e))
             raise
     
+    def _encode_matrix(self, data: str, border: int, error_correction: str):
+        """
+        Encode data to a bordered module matrix via libqrencode
+
+        Returns None when the C extension isn't installed, in which case
+        callers stay on the pure-Python qrcode path.
+        """
+        if qrencode is None:
+            return None
+
+        level = _QRENCODE_LEVELS.get(error_correction, qrencode.QR_ECLEVEL_M)
+        _, modules, image = qrencode.encode(data, level=level, case_sensitive=True)
+
+        pixels = list(image.getdata())
+        matrix = [
+            [pixels[y * modules + x] < 128 for x in range(modules)]
+            for y in range(modules)
+        ]
+
+        if border:
+            width = modules + 2 * border
+            matrix = (
+                [[False] * width for _ in range(border)]
+                + [[False] * border + row + [False] * border for row in matrix]
+                + [[False] * width for _ in range(border)]
+            )
+        return matrix
+
+    def _fresh_qr(self, error_correction: str, size: int, border: int) -> qrcode.QRCode:
+        """
+        Hand out a QRCode seeded from a per-configuration template
+
+        The constructor's state depends only on (ecc, box_size, border),
+        never on the payload, so it is run once per configuration and
+        later requests shallow-copy the template. clear() reassigns the
+        copy's mutable encoding state (data_list, modules, data_cache),
+        so template and copies never share it.
+        """
+        key = (error_correction, size, border)
+        template = self._templates.get(key)
+        if template is None:
+            template = qrcode.QRCode(
+                version=1,  # Auto-adjust
+                error_correction=_ECC.get(error_correction, qrcode.constants.ERROR_CORRECT_M),
+                box_size=size,
+                border=border,
+            )
+            # Plain dict assignment is atomic; worker threads racing here
+            # at worst build the same template twice
+            self._templates[key] = template
+
+        qr = copy.copy(template)
+        qr.clear()
+        return qr
+
     def _generate_qr_sync(
         self,
         data: str,
@@ -120,22 +642,33 @@ class QRCodeGenerator:
         back_color: str,
         style: Optional[str]
     ) -> bytes:
-        """Synchronous QR code generation (runs in thread pool)"""
-        
-        # Create QR code instance
-        qr = qrcode.QRCode(
-            version=1,  # Auto-adjust
-            error_correction=self.error_correction_levels.get(error_correction, qrcode.constants.ERROR_CORRECT_M),
-            box_size=size,
-            border=border,
-        )
-        
+        """Synchronous QR code generation (runs in thread pool; format and
+        error_correction arrive upper-cased from the async boundary)"""
+
+        # Prefer the C-backed encoder where its matrix can feed a direct
+        # renderer (unstyled PNG, SVG); styled PNG and PDF still need
+        # the qrcode image factories
+        if format in ("PNG", "SVG") and style is None:
+            try:
+                matrix = self._encode_matrix(data, border, error_correction)
+                if matrix is not None:
+                    rows, width = _pack_matrix(matrix)
+                    if format == "SVG":
+                        return _write_svg(rows, width, size, fill_color, back_color)
+                    return _write_png_1bit(rows, width, size, fill_color, back_color)
+            except Exception as e:
+                logger.warning("qrencode fast path failed, falling back to qrcode",
+                              error=str(e))
+
+        # Create QR code instance from a warm template
+        qr = self._fresh_qr(error_correction, size, border)
+
         qr.add_data(data)
         qr.make(fit=True)
-        
-        if format.upper() == "SVG":
+
+        if format == "SVG":
             return self._generate_svg(qr, fill_color, back_color)
-        elif format.upper() == "PDF":
+        elif format == "PDF":
             return self._generate_pdf(qr, fill_color, back_color)
         else:  # Default to PNG
             return self._generate_png(qr, fill_color, back_color, style)
@@ -157,8 +690,15 @@ class QRCodeGenerator:
                 back_color=back_color
             )
         else:
-            img = qr.make_image(fill_color=fill_color, back_color=back_color)
-        
+            # Unstyled codes go through the direct 1-bit PNG writer;
+            # fall back to Pillow if e.g. a color fails to parse
+            try:
+                rows, width = _pack_matrix(qr.get_matrix())
+                return _write_png_1bit(rows, width, qr.box_size, fill_color, back_color)
+            except Exception as e:
+                logger.warning("Direct PNG writer failed, falling back to Pillow", error=str(e))
+                img = qr.make_image(fill_color=fill_color, back_color=back_color)
+
         # Convert to bytes
         img_buffer = io.BytesIO()
         img.save(img_buffer, format='PNG', optimize=True)
@@ -166,14 +706,21 @@ class QRCodeGenerator:
     
     def _generate_svg(self, qr, fill_color: str, back_color: str) -> bytes:
         """Generate SVG format QR code"""
+        try:
+            rows, width = _pack_matrix(qr.get_matrix())
+            return _write_svg(rows, width, qr.box_size, fill_color, back_color)
+        except Exception as e:
+            logger.warning("Direct SVG writer failed, falling back to qrcode",
+                          error=str(e))
+
         from qrcode.image.svg import SvgPathImage
-        
+
         img = qr.make_image(
             image_factory=SvgPathImage,
             fill_color=fill_color,
             back_color=back_color
         )
-        
+
         # Convert to bytes
         svg_buffer = io.BytesIO()
         img.save(svg_buffer)
@@ -181,9 +728,23 @@ class QRCodeGenerator:
     
     def _generate_pdf(self, qr, fill_color: str, back_color: str) -> bytes:
         """Generate PDF format QR code"""
-        # First generate PNG, then convert to PDF
-        img = qr.make_image(fill_color=fill_color, back_color=back_color)
-        
+        # Vector output when reportlab is installed: no raster stream at all
+        if _pdf_canvas is not None:
+            try:
+                rows, width = _pack_matrix(qr.get_matrix())
+                return _write_pdf_vector(rows, width, qr.box_size,
+                                         fill_color, back_color)
+            except Exception as e:
+                logger.warning("Vector PDF writer failed, falling back to raster",
+                              error=str(e))
+
+        # Rasterize via the vectorized path for the common monochrome
+        # case; colored output still needs the Pillow factory
+        if np is not None and fill_color == "black" and back_color == "white":
+            img = _matrix_to_image(qr.get_matrix(), qr.box_size)
+        else:
+            img = qr.make_image(fill_color=fill_color, back_color=back_color)
+
         # Convert PIL image to PDF
         pdf_buffer = io.BytesIO()
         img.save(pdf_buffer, format='PDF', optimize=True)
@@ -199,19 +760,26 @@ class QRCodeGenerator:
         Returns:
             Tuple of (file_data, content_type)
         """
-        if qr_id not in self.cache:
-            raise FileNotFoundError(f"QR code {qr_id} not found")
-        
-        result = self.cache[qr_id]
+        result = self.cache.get(qr_id)
+        if result is not None:
+            self.cache.touch(qr_id)
+        else:
+            # RAM miss: fall back to the persistent tier before giving up
+            # (SQLite reads block, so run them in the worker pool)
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.disk_cache.get, qr_id
+            ) if self.disk_cache else None
+            if result is None:
+                raise FileNotFoundError(f"QR code {qr_id} not found")
+            self.cache[qr_id] = result
+            qr_cache_items.set(len(self.cache))
         format = result["format"].upper()
-        
-        content_types = {
-            "PNG": "image/png",
-            "SVG": "image/svg+xml",
-            "PDF": "application/pdf"
-        }
-        
-        return result["file_data"], content_types.get(format, "image/png")
+
+        file_data = result["file_data"]
+        if result.get("compressed"):
+            file_data = _ZSTD_DECOMPRESSOR.decompress(file_data)
+
+        return file_data, _CONTENT_TYPES.get(format, "image/png")
     
     async def generate_wifi_qr(
         self,
@@ -250,21 +818,44 @@ END:VCARD"""
         
         return await self.generate_qr_code(url, **kwargs)
     
+    def self_test(self) -> bool:
+        """
+        Verify QR generation works, memoizing the result
+
+        Used by health checks so repeated probes don't generate
+        and discard a real QR code each time.
+        """
+        if self._self_test_result is None:
+            try:
+                self._generate_qr_sync(
+                    "health-check-test", "PNG", 10, 4, "M", "black", "white", None
+                )
+                self._self_test_result = True
+            except Exception as e:
+                logger.error("QR generator self-test failed", error=str(e))
+                self._self_test_result = False
+        return self._self_test_result
+
     def get_cache_stats(self) -> Dict:
         """Get cache statistics"""
-        total_size = sum(len(item["file_data"]) for item in self.cache.values())
+        cached_items, total_size = self.cache.stats()
         return {
-            "cached_items": len(self.cache),
+            "cached_items": cached_items,
             "total_cache_size": total_size,
-            "average_size": total_size / len(self.cache) if self.cache else 0
+            "average_size": total_size / cached_items if cached_items else 0
         }
     
     def clear_cache(self):
         """Clear the QR code cache"""
         self.cache.clear()
+        self._param_index.clear()
+        qr_cache_items.set(0)
         logger.info("QR code cache cleared")
     
     def cleanup(self):
         """Cleanup resources"""
-        self.executor.shutdown(wait=True)
+        # The generation pool is process-scoped (shut down via atexit),
+        # so only instance-owned resources are released here
+        if self.disk_cache:
+            self.disk_cache.close()
         self.clear_cache()
@@ -5,13 +5,22 @@ Handles file storage across AWS S3 and Azure Blob Storage with
 unified interface and error handling.
 """
 
+import hashlib
+import io
 import os
 import asyncio
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+import time
+import types
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+from datetime import datetime, timedelta, timezone
+
+from ._timestamps import now_iso
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError, NoCredentialsError
+from azure.storage.blob import ContentSettings
 from azure.storage.blob.aio import BlobServiceClient
 from azure.core.exceptions import AzureError
 from azure.identity.aio import DefaultAzureCredential
@@ -19,12 +28,64 @@ import structlog
 
 logger = structlog.get_logger()
 
+# Content types by file format, frozen at module scope
+_CONTENT_TYPES = types.MappingProxyType({
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf'
+})
+
+# Shared S3 transfer settings: stream bodies in chunks instead of copying
+# them through the request serializer, switching to parallel multipart
+# for large payloads
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True
+)
+
+# Signed URLs are valid for an hour; cached copies are reused until five
+# minutes before expiry so clients never receive a nearly dead link
+_SIGNED_URL_EXPIRY = 3600
+_SIGNED_URL_TTL = _SIGNED_URL_EXPIRY - 300
+
+class _URLCache:
+    """
+    TTL + LRU cache for signed download URLs
+
+    Presigning and SAS generation are pure functions of (location, key,
+    credentials), with HMAC signing CPU that dominates small uploads, so
+    reuse the URL until its safety margin runs out.
+    """
+
+    def __init__(self, max_items: int = 1024):
+        self._entries: "OrderedDict[tuple, Tuple[float, str]]" = OrderedDict()
+        self._max_items = max_items
+
+    def get(self, key) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, url = entry
+        if time.monotonic() >= expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return url
+
+    def put(self, key, url: str, ttl: float = _SIGNED_URL_TTL):
+        self._entries[key] = (time.monotonic() + ttl, url)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._max_items:
+            self._entries.popitem(last=False)
+
 class MultiCloudStorageManager:
     """Unified storage manager for AWS S3 and Azure Blob Storage"""
     
     def __init__(self):
         self.aws_client = None
         self.azure_client = None
+        self._container_client = None
         self.aws_bucket = os.getenv("AWS_S3_BUCKET", "qr-codes-bucket")
         self.azure_container = os.getenv("AZURE_CONTAINER", "qr-codes")
         self.aws_region = os.getenv("AWS_REGION", "us-east-1")
@@ -33,6 +94,9 @@ class MultiCloudStorageManager:
         # Storage configuration
         self.aws_enabled = True
         self.azure_enabled = True
+
+        # Signed download URLs reused within their validity window
+        self._url_cache = _URLCache()
         
     async def initialize(self):
         """Initialize cloud storage clients"""
@@ -70,6 +134,9 @@ class MultiCloudStorageManager:
                     self.azure_client = BlobServiceClient.from_connection_string(connection_string)
             
             if self.azure_client:
+                # One container client shared by every upload/delete so the
+                # underlying transport and its connection pool are reused
+                self._container_client = self.azure_client.get_container_client(self.azure_container)
                 await self._test_azure_connection()
                 logger.info("Azure Blob Storage client initialized successfully")
             else:
@@ -103,8 +170,7 @@ class MultiCloudStorageManager:
     async def _test_azure_connection(self):
         """Test Azure Blob Storage connection"""
         try:
-            container_client = self.azure_client.get_container_client(self.azure_container)
-            await container_client.get_container_properties()
+            await self._container_client.get_container_properties()
         except AzureError as e:
             if "ContainerNotFound" in str(e):
                 # Container doesn't exist, try to create it
@@ -137,8 +203,7 @@ class MultiCloudStorageManager:
     async def _create_azure_container(self):
         """Create Azure Blob Storage container if it doesn't exist"""
         try:
-            container_client = self.azure_client.get_container_client(self.azure_container)
-            await container_client.create_container()
+            await self._container_client.create_container()
             logger.info("Azure container created", container=self.azure_container)
         except AzureError as e:
             logger.error("Failed to create Azure container", error=str(e))
@@ -157,27 +222,37 @@ class MultiCloudStorageManager:
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(
                 None,
-                lambda: self.aws_client.put_object(
-                    Bucket=self.aws_bucket,
-                    Key=key,
-                    Body=file_data,
-                    ContentType=content_type,
-                    Metadata={
-                        'generated_at': datetime.utcnow().isoformat(),
-                        'file_format': file_format
-                    }
+                lambda: self.aws_client.upload_fileobj(
+                    io.BytesIO(file_data),
+                    self.aws_bucket,
+                    key,
+                    ExtraArgs={
+                        'ContentType': content_type,
+                        # Single-pass integrity check computed by the SDK;
+                        # ContentMD5 isn't accepted by the transfer manager
+                        'ChecksumAlgorithm': 'CRC32',
+                        'Metadata': {
+                            'generated_at': now_iso(),
+                            'file_format': file_format
+                        }
+                    },
+                    Config=_TRANSFER_CONFIG
                 )
             )
             
-            # Generate presigned URL for download
-            url = await loop.run_in_executor(
-                None,
-                lambda: self.aws_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': self.aws_bucket, 'Key': key},
-                    ExpiresIn=3600
+            # Generate presigned URL for download, reusing a fresh-enough
+            # previously signed one
+            url = self._url_cache.get((self.aws_bucket, key))
+            if url is None:
+                url = await loop.run_in_executor(
+                    None,
+                    lambda: self.aws_client.generate_presigned_url(
+                        'get_object',
+                        Params={'Bucket': self.aws_bucket, 'Key': key},
+                        ExpiresIn=_SIGNED_URL_EXPIRY
+                    )
                 )
-            )
+                self._url_cache.put((self.aws_bucket, key), url)
             
             logger.info("File uploaded to AWS S3", file_id=file_id, key=key)
             return url
@@ -196,33 +271,46 @@ class MultiCloudStorageManager:
             blob_name = f"qr-codes/{file_id}.{file_format.lower()}"
             content_type = self._get_content_type(file_format)
             
-            blob_client = self.azure_client.get_blob_client(
-                container=self.azure_container,
-                blob=blob_name
-            )
-            
+            blob_client = self._container_client.get_blob_client(blob_name)
+
+            # Stored as the blob's x-ms-blob-content-md5 property so
+            # downloaders can check integrity; hashed once up front
+            # (the SDK types the field as a bytearray)
+            content_md5 = bytearray(hashlib.md5(file_data).digest())
+
+            # Pass bytes directly: the SDK wraps them in a zero-copy
+            # BytesIO, whereas a memoryview would be treated as a chunk
+            # iterator and fail on read
             await blob_client.upload_blob(
                 file_data,
-                content_type=content_type,
+                max_concurrency=4,
+                content_settings=ContentSettings(
+                    content_type=content_type,
+                    content_md5=content_md5
+                ),
                 metadata={
-                    'generated_at': datetime.utcnow().isoformat(),
+                    'generated_at': now_iso(),
                     'file_format': file_format
                 },
                 overwrite=True
             )
             
-            # Generate SAS URL for download
-            from azure.storage.blob import generate_blob_sas, BlobSasPermissions
-            
-            sas_token = generate_blob_sas(
-                account_name=self.azure_account,
-                container_name=self.azure_container,
-                blob_name=blob_name,
-                permission=BlobSasPermissions(read=True),
-                expiry=datetime.utcnow() + timedelta(hours=1)
-            )
-            
-            url = f"https://{self.azure_account}.blob.core.windows.net/{self.azure_container}/{blob_name}?{sas_token}"
+            # Generate SAS URL for download, reusing a fresh-enough
+            # previously signed token
+            url = self._url_cache.get((self.azure_container, blob_name))
+            if url is None:
+                from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+
+                sas_token = generate_blob_sas(
+                    account_name=self.azure_account,
+                    container_name=self.azure_container,
+                    blob_name=blob_name,
+                    permission=BlobSasPermissions(read=True),
+                    expiry=datetime.now(timezone.utc) + timedelta(seconds=_SIGNED_URL_EXPIRY)
+                )
+
+                url = f"https://{self.azure_account}.blob.core.windows.net/{self.azure_container}/{blob_name}?{sas_token}"
+                self._url_cache.put((self.azure_container, blob_name), url)
             
             logger.info("File uploaded to Azure Blob Storage", file_id=file_id, blob_name=blob_name)
             return url
@@ -231,6 +319,29 @@ class MultiCloudStorageManager:
             logger.error("Azure Blob Storage upload failed", file_id=file_id, error=str(e))
             return None
     
+    async def upload_to_all(self, file_id: str, file_data: bytes, file_format: str) -> Dict[str, Optional[str]]:
+        """
+        Upload a file to every enabled provider concurrently
+
+        Both network round-trips overlap, so wall time is max(aws, azure)
+        rather than their sum. A failure on one provider is logged and
+        reported as None without affecting the other.
+        """
+        aws_url, azure_url = await asyncio.gather(
+            self.upload_to_aws(file_id, file_data, file_format),
+            self.upload_to_azure(file_id, file_data, file_format),
+            return_exceptions=True
+        )
+
+        if isinstance(aws_url, BaseException):
+            logger.error("AWS S3 upload failed", file_id=file_id, error=str(aws_url))
+            aws_url = None
+        if isinstance(azure_url, BaseException):
+            logger.error("Azure Blob Storage upload failed", file_id=file_id, error=str(azure_url))
+            azure_url = None
+
+        return {'aws': aws_url, 'azure': azure_url}
+
     async def delete_from_aws(self, file_id: str, file_format: str) -> bool:
         """Delete file from AWS S3"""
         if not self.aws_enabled:
@@ -261,11 +372,8 @@ class MultiCloudStorageManager:
         
         try:
             blob_name = f"qr-codes/{file_id}.{file_format.lower()}"
-            blob_client = self.azure_client.get_blob_client(
-                container=self.azure_container,
-                blob=blob_name
-            )
-            
+            blob_client = self._container_client.get_blob_client(blob_name)
+
             await blob_client.delete_blob()
             
             logger.info("File deleted from Azure Blob Storage", file_id=file_id, blob_name=blob_name)
@@ -277,12 +385,7 @@ class MultiCloudStorageManager:
     
     def _get_content_type(self, file_format: str) -> str:
         """Get content type for file format"""
-        content_types = {
-            'png': 'image/png',
-            'svg': 'image/svg+xml',
-            'pdf': 'application/pdf'
-        }
-        return content_types.get(file_format.lower(), 'application/octet-stream')
+        return _CONTENT_TYPES.get(file_format.lower(), 'application/octet-stream')
     
     async def get_storage_status(self) -> Dict[str, Any]:
         """Get storage provider status"""
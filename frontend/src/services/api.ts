@@ -54,14 +54,16 @@ export interface QRCodeResponse {
   format: string;
   size: number;
   download_url: string;
-  qr_code_base64: string;  // Base64 encoded QR code image for immediate preview
+  qr_code_base64?: string;  // Base64 preview, only present when requested with inline=true
   aws_url?: string;
   azure_url?: string;
   created_at: string;
 }
 
 export const generateQRCode = async (request: QRCodeRequest): Promise<QRCodeResponse> => {
-  const response = await api.post('/qr/generate', request);
+  // Request the inline base64 payload so the preview renders immediately;
+  // batch responses skip it and are downloaded on demand instead
+  const response = await api.post('/qr/generate', request, { params: { inline: true } });
   return response.data;
 };
 